@@ -1,25 +1,253 @@
-from flask import Flask, render_template, jsonify, request, send_from_directory
+from flask import Flask, Response, render_template, jsonify, request, send_from_directory, stream_with_context
+from flask.json.provider import DefaultJSONProvider
 import yfinance as yf
 import requests
+from requests.adapters import HTTPAdapter
 import pandas as pd
 import numpy as np
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timedelta
-import json
+import hashlib
+import logging
 import os
+import threading
+import time
+
+try:
+    import orjson
+except ImportError:  # optional; fall back to Flask's stdlib json provider
+    orjson = None
+
+class OrjsonProvider(DefaultJSONProvider):
+    """Flask JSON provider backed by orjson"""
+
+    def dumps(self, obj, **kwargs):
+        option = orjson.OPT_NON_STR_KEYS | orjson.OPT_SERIALIZE_NUMPY
+        if kwargs.get('sort_keys', self.sort_keys):
+            option |= orjson.OPT_SORT_KEYS
+        if kwargs.get('indent'):
+            option |= orjson.OPT_INDENT_2
+        return orjson.dumps(obj, default=self.default, option=option).decode()
+
+    def loads(self, s, **kwargs):
+        return orjson.loads(s)
 
 app = Flask(__name__)
+if orjson is not None:
+    app.json = OrjsonProvider(app)
 
 # Configuration
 LLMSTUDIO_URL = "http://localhost:1234/v1/chat/completions"
+MAX_BATCH_SYMBOLS = 20
+LLM_TIMEOUT = (3, 60)  # (connect, read) seconds so a stuck LM Studio can't wedge a worker
+LLM_DEFAULT_MAX_TOKENS = 180  # clients may ask for more with ?max_tokens=
+LLM_MAX_TOKENS_LIMIT = 1024
+YF_CACHE_TTL = 300  # seconds to reuse Yahoo Finance lookups per ticker
+INVALID_TICKER_MISSES = 2  # consecutive empty info lookups before a ticker is treated as invalid
+LLM_CACHE_TTL = 3600  # seconds to reuse LLM completions
+LLM_CACHE_SIZE = 1024
+YF_CACHE_SIZE = 256
+
+class TTLCache:
+    """Small thread-safe LRU mapping whose entries expire after ttl seconds"""
+
+    def __init__(self, maxsize, ttl):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                return None
+            if time.monotonic() - entry[0] >= self.ttl:
+                del self._data[key]
+                return None
+            self._data.move_to_end(key)
+            return entry[1]
+
+    def set(self, key, value):
+        with self._lock:
+            self._data[key] = (time.monotonic(), value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def delete(self, key):
+        with self._lock:
+            self._data.pop(key, None)
+
+    def get_or_set(self, key, fetch_fn):
+        """Return the fresh cached value for key, otherwise fetch and store it"""
+        value = self.get(key)
+        if value is None:
+            value = fetch_fn()
+            self.set(key, value)
+        return value
+
+# Yahoo Finance lookups keyed by ticker
+_ticker_cache = TTLCache(maxsize=YF_CACHE_SIZE, ttl=YF_CACHE_TTL)
+_info_cache = TTLCache(maxsize=YF_CACHE_SIZE, ttl=YF_CACHE_TTL)
+_income_cache = TTLCache(maxsize=YF_CACHE_SIZE, ttl=YF_CACHE_TTL)
+_balance_cache = TTLCache(maxsize=YF_CACHE_SIZE, ttl=YF_CACHE_TTL)
+
+# Shared pool for fetching a ticker's two statements side by side
+_statement_executor = ThreadPoolExecutor(max_workers=10)
+
+# Shared keep-alive session for LLM calls
+LLM_SESSION = requests.Session()
+LLM_SESSION.mount('http://', HTTPAdapter(pool_connections=4, pool_maxsize=8))
+
+# LLM completions keyed by a hash of the prompt. Endpoint responses map a hash
+# of the posted data to that prompt key, so repeat posts skip prompt building
+# without storing each completion twice.
+_llm_cache = TTLCache(maxsize=LLM_CACHE_SIZE, ttl=LLM_CACHE_TTL)
+_response_cache = TTLCache(maxsize=LLM_CACHE_SIZE, ttl=LLM_CACHE_TTL)
+
+# Count of recent empty info lookups per ticker, so repeated bogus lookups
+# don't hit Yahoo. yfinance hides HTTP errors and returns empty info, so a
+# single miss may be a transient failure rather than an unknown symbol.
+_invalid_tickers = TTLCache(maxsize=1024, ttl=YF_CACHE_TTL)
 
 def safe_float(value):
     """Convert value to float safely, return None if not possible"""
+    if value is None:
+        return None
     try:
-        if pd.isna(value):
-            return None
-        return float(value)
-    except:
+        result = float(value)
+    except (TypeError, ValueError):
         return None
+    return None if result != result else result  # NaN is the only float not equal to itself
+
+def float_or_zero(value):
+    """Return a JSON-decoded number as-is, or 0.0 for anything missing or non-numeric"""
+    return value if isinstance(value, (int, float)) and value == value else 0.0
+
+def first_float(info, *keys):
+    """Return the first non-zero float found under keys in info, or None"""
+    for key in keys:
+        value = safe_float(info.get(key))
+        if value:
+            return value
+    return None
+
+def cached_ticker(ticker):
+    return _ticker_cache.get_or_set(ticker, lambda: yf.Ticker(ticker))
+
+# The data accessors below return (value, fetched_at) so responses can report
+# when the possibly cached data actually came from Yahoo
+
+def cached_info(ticker):
+    return _info_cache.get_or_set(ticker, lambda: (cached_ticker(ticker).info, datetime.now()))
+
+def cached_income_stmt(ticker):
+    return _income_cache.get_or_set(ticker, lambda: (cached_ticker(ticker).quarterly_income_stmt, datetime.now()))
+
+def cached_balance_sheet(ticker):
+    return _balance_cache.get_or_set(ticker, lambda: (cached_ticker(ticker).quarterly_balance_sheet, datetime.now()))
+
+def _llm_key(system, user, max_tokens):
+    raw = f"{system}|{user}|{max_tokens}".encode()
+    return hashlib.blake2b(raw, digest_size=16).hexdigest()
+
+def _llm_payload(system, user, max_tokens, stream=False):
+    return {
+        "messages": [
+            {"role": "system", "content": system},
+            {"role": "user", "content": user}
+        ],
+        "temperature": 0.7,
+        "max_tokens": max_tokens,
+        "stream": stream
+    }
+
+def llm_call(system, user, max_tokens=LLM_DEFAULT_MAX_TOKENS):
+    """Send a chat completion to the local LLM, reusing the first generation for a repeated prompt.
+
+    Returns the completion text, or None if the LLM responded with an error status.
+    """
+    key = _llm_key(system, user, max_tokens)
+    cached = _llm_cache.get(key)
+    if cached is not None:
+        return cached
+
+    response = LLM_SESSION.post(LLMSTUDIO_URL, json=_llm_payload(system, user, max_tokens), timeout=LLM_TIMEOUT)
+    if response.status_code != 200:
+        return None
+
+    content = response.json()['choices'][0]['message']['content']
+    if content:
+        _llm_cache.set(key, content)
+    return content
+
+def llm_stream(system, user, max_tokens=LLM_DEFAULT_MAX_TOKENS):
+    """Yield completion text from the local LLM as it is generated.
+
+    A cached completion is yielded in one piece; a streamed one is cached only if it
+    reaches [DONE] with some text, so truncated or empty generations are not reused.
+    Raises RuntimeError if the LLM responded with an error status.
+    """
+    key = _llm_key(system, user, max_tokens)
+    cached = _llm_cache.get(key)
+    if cached is not None:
+        yield cached
+        return
+
+    parts = []
+    finished = False
+    with LLM_SESSION.post(LLMSTUDIO_URL, json=_llm_payload(system, user, max_tokens, stream=True),
+                          timeout=LLM_TIMEOUT, stream=True) as response:
+        if response.status_code != 200:
+            raise RuntimeError(f"LLM responded with status {response.status_code}")
+
+        # LM Studio streams OpenAI-style SSE lines: "data: {...}" ... "data: [DONE]"
+        for line in response.iter_lines():
+            line = line.decode('utf-8')
+            if not line.startswith('data:'):
+                continue
+            chunk = line[len('data:'):].strip()
+            if chunk == '[DONE]':
+                finished = True
+                break
+            delta = app.json.loads(chunk)['choices'][0].get('delta', {}).get('content')
+            if delta:
+                parts.append(delta)
+                yield delta
+
+    if not finished or not parts:
+        app.logger.warning("LLM stream ended without a complete response; not caching it")
+        return
+
+    _llm_cache.set(key, ''.join(parts))
+
+def sse_response(chunks):
+    """Relay text chunks (e.g. from llm_stream) to the client as server-sent events"""
+    def generate():
+        try:
+            for text in chunks:
+                yield f"data: {app.json.dumps({'content': text})}\n\n"
+        except Exception as e:
+            app.logger.error("Error streaming LLM response: %s", e)
+            yield f"event: error\ndata: {app.json.dumps({'error': str(e)})}\n\n"
+            return
+        yield "event: done\ndata: {}\n\n"
+
+    return Response(stream_with_context(generate()), mimetype='text/event-stream')
+
+def response_cache_key(endpoint, data, max_tokens):
+    """Content hash of the posted data for memoizing an endpoint's LLM response"""
+    # lastUpdated changes whenever the data is refetched but never reaches the prompt
+    company_info = {k: v for k, v in data.get('company_info', {}).items() if k != 'lastUpdated'}
+    raw = app.json.dumps({**data, 'company_info': company_info}, sort_keys=True).encode()
+    return f"{hashlib.blake2b(raw, digest_size=16).hexdigest()}:{endpoint}:{max_tokens}"
+
+def requested_max_tokens():
+    """Read the optional max_tokens query parameter, clamped to a sane range"""
+    max_tokens = request.args.get('max_tokens', LLM_DEFAULT_MAX_TOKENS, type=int)
+    return min(max(max_tokens, 1), LLM_MAX_TOKENS_LIMIT)
 
 @app.route('/')
 def home():
@@ -29,357 +257,308 @@ def home():
 def send_static(path):
     return send_from_directory('static', path)
 
-@app.route('/api/stock/<ticker>', methods=['GET'])
-def get_stock_data(ticker):
-    try:
-        # Get stock information using yfinance
-        stock = yf.Ticker(ticker)
-        
-        # Get current price info
-        info = stock.info
-        print("Stock Info Keys:", info.keys())  # Debug print
+def normalize_ticker(symbol):
+    """Canonical form of a ticker symbol, used for cache keys and responses"""
+    return symbol.strip().upper()
+
+class TickerNotFound(Exception):
+    """Raised when Yahoo has no usable data for a ticker"""
+
+def _fetch_one(ticker):
+    """Build the company info and quarterly data payload for a single ticker"""
+    ticker = normalize_ticker(ticker)
+    misses = _invalid_tickers.get(ticker) or 0
+    if misses >= INVALID_TICKER_MISSES:
+        raise TickerNotFound(f'Invalid ticker {ticker}')
+
+    # Check the ticker is real before paying for the statement round-trips
+    info, info_fetched_at = cached_info(ticker)
+    if not info or info.get('quoteType') is None:
+        # Don't keep the empty lookup around, so a retry asks Yahoo again
+        _info_cache.delete(ticker)
+        _ticker_cache.delete(ticker)
+        _invalid_tickers.set(ticker, misses + 1)
+        raise TickerNotFound(f'Invalid ticker {ticker}')
+    if misses:
+        _invalid_tickers.delete(ticker)
+
+    # Fetch quarterly statements (cached per ticker); when neither is cached,
+    # fetch the income statement on the shared pool while this thread gets the balance sheet
+    if _income_cache.get(ticker) is None and _balance_cache.get(ticker) is None:
+        income_future = _statement_executor.submit(cached_income_stmt, ticker)
+        balance, balance_fetched_at = cached_balance_sheet(ticker)
+        income_stmt, income_fetched_at = income_future.result()
+    else:
+        income_stmt, income_fetched_at = cached_income_stmt(ticker)
+        balance, balance_fetched_at = cached_balance_sheet(ticker)
+    fetched_at = min(info_fetched_at, income_fetched_at, balance_fetched_at)
+    app.logger.debug("Stock info keys for %s: %s", ticker, info.keys())
+    
+    # Try different price fields
+    current_price = first_float(info, 'currentPrice', 'regularMarketPrice', 'lastPrice', 'price')
+    previous_close = first_float(info, 'previousClose', 'regularMarketPreviousClose')
+    
+    if current_price and previous_close:
+        price_change = ((current_price - previous_close) / previous_close) * 100
+    else:
+        price_change = None
         
-        # Try different price fields
-        current_price = (
-            safe_float(info.get('currentPrice')) or
-            safe_float(info.get('regularMarketPrice')) or
-            safe_float(info.get('lastPrice')) or
-            safe_float(info.get('price'))
-        )
+    # Get shares outstanding for EPS calculation, falling back to market cap / price
+    shares_outstanding = first_float(info, 'sharesOutstanding', 'shares')
+    if shares_outstanding is None and current_price:
+        market_cap = safe_float(info.get('marketCap'))
+        if market_cap:
+            shares_outstanding = market_cap / current_price
+    app.logger.debug("Shares Outstanding: %s", shares_outstanding)
         
-        previous_close = (
-            safe_float(info.get('previousClose')) or
-            safe_float(info.get('regularMarketPreviousClose'))
-        )
-        
-        if current_price and previous_close:
-            price_change = ((current_price - previous_close) / previous_close) * 100
-        else:
-            price_change = None
+    # Get EPS values
+    eps = first_float(info, 'trailingEPS', 'forwardEPS')
+    
+    app.logger.debug("Income Statement Columns: %s", income_stmt.columns)
+    app.logger.debug("Income Statement Index: %s", income_stmt.index)
+    
+    if income_stmt.empty:
+        raise TickerNotFound(f'No financial data found for ticker {ticker}')
+
+    # Process the financial data
+    quarterly_data = []
+    
+    # Get the last 4 quarters of data: cut each statement down to the metric rows
+    # (alternative field names follow their primary ones) and the income
+    # statement's quarter dates, then stack them into one array
+    income_rows = ['Total Revenue', 'Revenue', 'Net Income', 'Net Income Common Stockholders']
+    balance_rows = ['Total Assets', 'Total Liabilities']
+    dates = income_stmt.columns[:4]
+    combined = pd.concat([
+        income_stmt[~income_stmt.index.duplicated()].reindex(index=income_rows, columns=dates),
+        balance[~balance.index.duplicated()].reindex(index=balance_rows, columns=dates),
+    ])
+    arr = combined.apply(pd.to_numeric, errors='coerce').to_numpy(dtype=np.float64)
+    revenues = np.where(np.isnan(arr[0]), arr[1], arr[0])
+    net_incomes = np.where(np.isnan(arr[2]), arr[3], arr[2])
+
+    for i, date in enumerate(dates):
+        # Extract metrics carefully
+        try:
+            revenue = safe_float(revenues[i])
+            net_income = safe_float(net_incomes[i])
+            total_assets = safe_float(arr[4, i])
+            total_liabilities = safe_float(arr[5, i])
             
-        # Get shares outstanding for EPS calculation
-        shares_outstanding = (
-            safe_float(info.get('sharesOutstanding')) or
-            safe_float(info.get('shares')) or
-            safe_float(info.get('marketCap') / current_price if current_price else None)
-        )
-        print(f"Shares Outstanding: {shares_outstanding}")
-            
-        # Get EPS values
-        eps = (
-            safe_float(info.get('trailingEPS')) or
-            safe_float(info.get('forwardEPS'))
-        )
-        
-        # Get quarterly financial data
-        income_stmt = stock.quarterly_income_stmt
-        balance = stock.quarterly_balance_sheet
-        
-        print("Income Statement Columns:", income_stmt.columns)
-        print("Income Statement Index:", income_stmt.index)
-        
-        if income_stmt.empty:
-            return jsonify({'error': f'No financial data found for ticker {ticker}'}), 404
-
-        # Process the financial data
-        quarterly_data = []
-        
-        # Get the last 4 quarters of data
-        for date in income_stmt.columns[:4]:
-            # Extract metrics carefully
-            try:
-                revenue = safe_float(income_stmt.loc['Total Revenue', date] if 'Total Revenue' in income_stmt.index else None)
-                net_income = safe_float(income_stmt.loc['Net Income', date] if 'Net Income' in income_stmt.index else None)
-                
-                # Try alternative field names if the main ones aren't found
-                if revenue is None:
-                    revenue = safe_float(income_stmt.loc['Revenue', date] if 'Revenue' in income_stmt.index else None)
-                
-                if net_income is None:
-                    net_income = safe_float(income_stmt.loc['Net Income Common Stockholders', date] if 'Net Income Common Stockholders' in income_stmt.index else None)
-                
-                # Get balance sheet metrics
-                total_assets = safe_float(balance.loc['Total Assets', date] if 'Total Assets' in balance.index else None)
-                total_liabilities = safe_float(balance.loc['Total Liabilities', date] if 'Total Liabilities' in balance.index else None)
-                
-                quarter_data = {
-                    'date': date.strftime('%Y-%m-%d'),
-                    'metrics': {
-                        'Revenue': revenue,
-                        'NetIncome': net_income,
-                        'Assets': total_assets,
-                        'Liabilities': total_liabilities,
-                    }
+            quarter_data = {
+                'date': date.strftime('%Y-%m-%d'),
+                'metrics': {
+                    'Revenue': revenue,
+                    'NetIncome': net_income,
+                    'Assets': total_assets,
+                    'Liabilities': total_liabilities,
                 }
-                
-                # Calculate EPS if we have net income and shares outstanding
-                if net_income and shares_outstanding:
-                    calculated_eps = net_income / shares_outstanding
-                    print(f"Calculated EPS: NetIncome ({net_income}) / Shares ({shares_outstanding}) = {calculated_eps}")
-                    quarter_data['metrics']['EPS'] = calculated_eps
-                elif 'trailingEPS' in info:
-                    print(f"Using trailingEPS from yfinance: {info['trailingEPS']}")
-                    quarter_data['metrics']['EPS'] = safe_float(info['trailingEPS'])
-                else:
-                    print("Could not calculate or fetch EPS")                # Calculate Profit Margin if possible
-                if revenue and net_income and revenue != 0:
-                    quarter_data['metrics']['ProfitMargin'] = (net_income / revenue) * 100
-                
-                quarterly_data.append(quarter_data)
-                
-            except Exception as e:
-                print(f"Error processing quarter {date}: {str(e)}")
-                continue
-
-        # Get company information
-        company_info = {
-            'name': info.get('longName', ticker),
-            'ticker': ticker,
-            'sector': info.get('sector', 'N/A'),
-            'industry': info.get('industry', 'N/A'),
-            'description': info.get('longBusinessSummary', 'N/A'),
-            'marketCap': safe_float(info.get('marketCap')),
-            'employees': info.get('fullTimeEmployees', 'N/A'),
-            'currentPrice': current_price,
-            'previousClose': previous_close,
-            'priceChange': price_change,
-            'eps': eps,
-            'lastUpdated': datetime.now().strftime('%Y-%m-%d %H:%M:%S')
-        }
-        
-        # Print debug information
-        print("Processed Data:", json.dumps({
+            }
+            
+            # Calculate EPS if we have net income and shares outstanding
+            if net_income and shares_outstanding:
+                calculated_eps = net_income / shares_outstanding
+                app.logger.debug("Calculated EPS: NetIncome (%s) / Shares (%s) = %s", net_income, shares_outstanding, calculated_eps)
+                quarter_data['metrics']['EPS'] = calculated_eps
+            elif 'trailingEPS' in info:
+                app.logger.debug("Using trailingEPS from yfinance: %s", info['trailingEPS'])
+                quarter_data['metrics']['EPS'] = safe_float(info['trailingEPS'])
+            else:
+                app.logger.debug("Could not calculate or fetch EPS")
+
+            # Calculate Profit Margin if possible
+            if revenue and net_income and revenue != 0:
+                quarter_data['metrics']['ProfitMargin'] = (net_income / revenue) * 100
+            
+            quarterly_data.append(quarter_data)
+            
+        except Exception as e:
+            app.logger.warning("Error processing quarter %s: %s", date, e)
+            continue
+
+    # Get company information
+    company_info = {
+        'name': info.get('longName', ticker),
+        'ticker': ticker,
+        'sector': info.get('sector', 'N/A'),
+        'industry': info.get('industry', 'N/A'),
+        'description': info.get('longBusinessSummary', 'N/A'),
+        'marketCap': safe_float(info.get('marketCap')),
+        'employees': info.get('fullTimeEmployees', 'N/A'),
+        'currentPrice': current_price,
+        'previousClose': previous_close,
+        'priceChange': price_change,
+        'eps': eps,
+        'lastUpdated': fetched_at.strftime('%Y-%m-%d %H:%M:%S')
+    }
+    
+    # Dumping the full payload is expensive, so only do it when debugging
+    if app.logger.isEnabledFor(logging.DEBUG):
+        app.logger.debug("Processed Data: %s", app.json.dumps({
             'company_info': company_info,
             'quarterly_data': quarterly_data
         }, indent=2))
 
-        return jsonify({
-            'company_info': company_info,
-            'quarterly_data': quarterly_data
-        })
-
-    except Exception as e:
-        print(f"Error in get_stock_data: {str(e)}")
-        return jsonify({'error': str(e)}), 500
+    return {
+        'company_info': company_info,
+        'quarterly_data': quarterly_data
+    }
 
-@app.route('/api/analyze', methods=['POST'])
-def analyze_financials():
+@app.route('/api/stock/<ticker>', methods=['GET'])
+def get_stock_data(ticker):
     try:
-        data = request.json
-        latest = data['quarterly_data'][0]['metrics']
-
-        # Safely get financial values with defaults
-        market_cap = safe_float(data['company_info'].get('marketCap')) or 0
-        current_price = safe_float(data['company_info'].get('currentPrice')) or 0
-        revenue = safe_float(latest.get('Revenue')) or 0
-        net_income = safe_float(latest.get('NetIncome')) or 0
-        eps = safe_float(latest.get('EPS')) or 0
-        profit_margin = safe_float(latest.get('ProfitMargin')) or 0
-        assets = safe_float(latest.get('Assets')) or 0
-        liabilities = safe_float(latest.get('Liabilities')) or 0
-
-        prompt = f"""Analyze the following quarterly financial data for {data['company_info']['name']} ({data['company_info']['ticker']}):
-
-Company Information:
-- Sector: {data['company_info']['sector']}
-- Industry: {data['company_info']['industry']}
-- Market Cap: ${market_cap:,.2f}
-- Current Price: ${current_price:,.2f}
-
-Latest Quarter Financials ({data['quarterly_data'][0]['date']}):
-- Revenue: ${revenue:,.2f}
-- Net Income: ${net_income:,.2f}
-- EPS: ${eps:,.2f}
-- Profit Margin: {profit_margin:.2f}%
-- Total Assets: ${assets:,.2f}
-- Total Liabilities: ${liabilities:,.2f}
-
-Provide a detailed analysis"""
-
-        response = requests.post(
-            LLMSTUDIO_URL,
-            json={
-                "messages": [
-                    {"role": "system", "content": "You are a financial analyst providing detailed company analysis."},
-                    {"role": "user", "content": prompt}
-                ],
-                "temperature": 0.7,
-                "max_tokens": 300
-            }
-        )
-
-        if response.status_code == 200:
-            return jsonify({'analysis': response.json()['choices'][0]['message']['content']})
-        else:
-            return jsonify({'error': "Error generating analysis"}), 500
-
+        return jsonify(_fetch_one(ticker))
+    except TickerNotFound as e:
+        return jsonify({'error': str(e)}), 404
     except Exception as e:
+        app.logger.error("Error in get_stock_data: %s", e)
         return jsonify({'error': str(e)}), 500
 
-@app.route('/api/predict', methods=['POST'])
-def predict_financials():
+@app.route('/api/stocks', methods=['GET'])
+def get_stocks_data():
+    symbols = [normalize_ticker(s) for s in request.args.get('symbols', '').split(',') if s.strip()]
+    if not symbols:
+        return jsonify({'error': 'No symbols provided'}), 400
+    if len(symbols) > MAX_BATCH_SYMBOLS:
+        return jsonify({'error': f'At most {MAX_BATCH_SYMBOLS} symbols per request'}), 400
+
+    # Fan out across tickers; a failure for one symbol does not abort the batch
+    results = {}
+    errors = {}
+    with ThreadPoolExecutor(max_workers=10) as ex:
+        futures = {ticker: ex.submit(_fetch_one, ticker) for ticker in dict.fromkeys(symbols)}
+        for ticker, future in futures.items():
+            try:
+                results[ticker] = future.result()
+            except Exception as e:
+                app.logger.error("Error fetching %s: %s", ticker, e)
+                errors[ticker] = str(e)
+
+    return jsonify({'results': results, 'errors': errors})
+
+def _analysis_prompt(data):
+    company = data['company_info']
+    latest = data['quarterly_data'][0]['metrics']
+
+    # Safely get financial values with defaults
+    market_cap = float_or_zero(company.get('marketCap'))
+    current_price = float_or_zero(company.get('currentPrice'))
+    revenue = float_or_zero(latest.get('Revenue'))
+    net_income = float_or_zero(latest.get('NetIncome'))
+    eps = float_or_zero(latest.get('EPS'))
+    profit_margin = float_or_zero(latest.get('ProfitMargin'))
+    assets = float_or_zero(latest.get('Assets'))
+    liabilities = float_or_zero(latest.get('Liabilities'))
+
+    return f"""Analyze {company['name']} ({company['ticker']}), {company['sector']} / {company['industry']}.
+Market cap ${market_cap:,.0f}, price ${current_price:,.2f}.
+Latest quarter {data['quarterly_data'][0]['date']}: revenue ${revenue:,.0f}, net income ${net_income:,.0f}, EPS ${eps:,.2f}, profit margin {profit_margin:.2f}%, assets ${assets:,.0f}, liabilities ${liabilities:,.0f}."""
+
+def _prediction_prompt(data):
+    company = data['company_info']
+    quarters = data['quarterly_data']
+
+    # Calculate quarter-over-quarter growth rates (quarters are newest first);
+    # missing or zero values become NaN and drop out of the results
+    rev = np.array([float_or_zero(q['metrics'].get('Revenue')) or np.nan for q in quarters], dtype=np.float64)
+    ni = np.array([float_or_zero(q['metrics'].get('NetIncome')) or np.nan for q in quarters], dtype=np.float64)
+    pm = np.array([float_or_zero(q['metrics'].get('ProfitMargin')) or np.nan for q in quarters], dtype=np.float64)
+
+    rev_growth = (rev[:-1] - rev[1:]) / rev[1:] * 100.0
+    ni_growth = (ni[:-1] - ni[1:]) / ni[1:] * 100.0
+    margin_delta = pm[:-1] - pm[1:]
+
+    revenue_growth = rev_growth[np.isfinite(rev_growth)].tolist()
+    income_growth = ni_growth[np.isfinite(ni_growth)].tolist()
+    margin_trend = margin_delta[np.isfinite(margin_delta)].tolist()
+
+    # One compact CSV row per quarter for the prompt
+    rows = []
+    for q in quarters:
+        metrics = q['metrics']
+        rows.append(f"{q['date']},{float_or_zero(metrics.get('Revenue')):.0f},"
+                    f"{float_or_zero(metrics.get('NetIncome')):.0f},{float_or_zero(metrics.get('ProfitMargin')):.2f}")
+    table = "\n".join(rows)
+
+    return f"""Predict next quarter for {company['name']} ({company['ticker']}), {company['sector']} / {company['industry']}.
+Market cap ${float_or_zero(company.get('marketCap')):,.0f}, price ${float_or_zero(company.get('currentPrice')):,.2f}.
+date,revenue,net_income,profit_margin_pct
+{table}
+Revenue growth %: {", ".join(f"{g:.2f}" for g in revenue_growth)}
+Net income growth %: {", ".join(f"{g:.2f}" for g in income_growth)}
+Margin change pts: {", ".join(f"{m:+.2f}" for m in margin_trend)}
+Give: revenue range, net income, profit margin, EPS estimate, growth drivers, challenges, confidence."""
+
+def _risk_prompt(data):
+    company = data['company_info']
+    latest = data['quarterly_data'][0]['metrics']
+
+    # Safely get financial values with defaults
+    market_cap = float_or_zero(company.get('marketCap'))
+    current_price = float_or_zero(company.get('currentPrice'))
+    revenue = float_or_zero(latest.get('Revenue'))
+    net_income = float_or_zero(latest.get('NetIncome'))
+    profit_margin = float_or_zero(latest.get('ProfitMargin'))
+    assets = float_or_zero(latest.get('Assets'))
+    liabilities = float_or_zero(latest.get('Liabilities'))
+
+    # Calculate risk metrics
+    debt_to_assets = (liabilities / assets * 100) if assets and liabilities and assets != 0 else None
+    debt_ratio = f"{debt_to_assets:.2f}%" if debt_to_assets is not None else "N/A"
+
+    return f"""Assess risks for {company['name']} ({company['ticker']}), {company['sector']} / {company['industry']}, {company['employees']} employees.
+Market cap ${market_cap:,.0f}, price ${current_price:,.2f}.
+Latest quarter {data['quarterly_data'][0]['date']}: revenue ${revenue:,.0f}, net income ${net_income:,.0f}, profit margin {profit_margin:.2f}%, assets ${assets:,.0f}, liabilities ${liabilities:,.0f}, debt/assets {debt_ratio}.
+Rate each Low/Medium/High with a one-line reason: financial, market, operational, strategic, external."""
+
+def _llm_endpoint(system_prompt, build_user_prompt, response_key):
+    """Shared body of the LLM endpoints: response cache, prompt, LLM call and optional streaming.
+
+    build_user_prompt turns the posted stock data into the user prompt; the completion is
+    returned as {response_key: text}, or streamed as server-sent events with ?stream=1.
+    """
     try:
         data = request.json
-        quarters = data['quarterly_data']
+        max_tokens = requested_max_tokens()
+        stream = request.args.get('stream') == '1'
 
-        # Calculate growth rates
-        revenue_growth = []
-        income_growth = []
-        margin_trend = []
+        # Identical posted data reuses the earlier completion without rebuilding the prompt
+        key = response_cache_key(response_key, data, max_tokens)
+        prompt_key = _response_cache.get(key)
+        content = _llm_cache.get(prompt_key) if prompt_key is not None else None
+        if content is not None:
+            return sse_response([content]) if stream else jsonify({response_key: content})
 
-        for i in range(len(quarters) - 1):
-            current = quarters[i]['metrics']
-            previous = quarters[i + 1]['metrics']
-            
-            if current.get('Revenue') and previous.get('Revenue'):
-                growth = ((current['Revenue'] - previous['Revenue']) / previous['Revenue']) * 100
-                revenue_growth.append(growth)
-            
-            if current.get('NetIncome') and previous.get('NetIncome'):
-                growth = ((current['NetIncome'] - previous['NetIncome']) / previous['NetIncome']) * 100
-                income_growth.append(growth)
-            
-            if current.get('ProfitMargin') and previous.get('ProfitMargin'):
-                margin_trend.append(current['ProfitMargin'] - previous['ProfitMargin'])
-
-        prompt = f"""Based on the historical quarterly data for {data['company_info']['name']} ({data['company_info']['ticker']}):
-
-Company Context:
-- Sector: {data['company_info']['sector']}
-- Industry: {data['company_info']['industry']}
-- Market Cap: ${data['company_info'].get('marketCap', 0):,.2f}
-- Current Price: ${data['company_info'].get('currentPrice', 0):,.2f}
-
-Historical Performance (Last 4 Quarters):
-Dates: {[q['date'] for q in quarters]}
-Revenue: {[f"${q['metrics'].get('Revenue', 0):,.2f}" for q in quarters]}
-Net Income: {[f"${q['metrics'].get('NetIncome', 0):,.2f}" for q in quarters]}
-Profit Margins: {[f"{q['metrics'].get('ProfitMargin', 0):,.2f}%" for q in quarters]}
-
-Growth Metrics:
-- Revenue Growth Rates: {[f"{g:.2f}%" for g in revenue_growth]}
-- Net Income Growth Rates: {[f"{g:.2f}%" for g in income_growth]}
-- Margin Trends: {[f"{m:+.2f}%" for m in margin_trend]}
-
-Provide detailed predictions for the next quarter in a summary format:
-1. Revenue Range Forecast
-2. Net Income Projection
-3. Expected Profit Margin
-4. EPS Estimate
-5. Key Growth Drivers
-6. Potential Challenges
-
-Include:
-- Market conditions impact
-- Industry trends
-- Company-specific factors
-- Confidence level in predictions
-- Key metrics to watch"""
-
-        response = requests.post(
-            LLMSTUDIO_URL,
-            json={
-                "messages": [
-                    {"role": "system", "content": "You are a financial analyst making data-driven predictions."},
-                    {"role": "user", "content": prompt}
-                ],
-                "temperature": 0.7,
-                "max_tokens": 300
-            }
-        )
+        prompt = build_user_prompt(data)
+        _response_cache.set(key, _llm_key(system_prompt, prompt, max_tokens))
+        if stream:
+            return sse_response(llm_stream(system_prompt, prompt, max_tokens))
+
+        content = llm_call(system_prompt, prompt, max_tokens)
 
-        if response.status_code == 200:
-            return jsonify({'prediction': response.json()['choices'][0]['message']['content']})
+        if content is not None:
+            return jsonify({response_key: content})
         else:
-            return jsonify({'error': "Error generating prediction"}), 500
+            return jsonify({'error': f"Error generating {response_key.replace('_', ' ')}"}), 500
 
     except Exception as e:
+        app.logger.error("Error generating %s: %s", response_key, e)
         return jsonify({'error': str(e)}), 500
 
-@app.route('/api/risk', methods=['POST'])
-def assess_risk():
-    try:
-        data = request.json
-        latest = data['quarterly_data'][0]['metrics']
-        
-        # Safely get financial values with defaults
-        market_cap = safe_float(data['company_info'].get('marketCap')) or 0
-        current_price = safe_float(data['company_info'].get('currentPrice')) or 0
-        revenue = safe_float(latest.get('Revenue')) or 0
-        net_income = safe_float(latest.get('NetIncome')) or 0
-        profit_margin = safe_float(latest.get('ProfitMargin')) or 0
-        assets = safe_float(latest.get('Assets')) or 0
-        liabilities = safe_float(latest.get('Liabilities')) or 0
-        
-        # Calculate risk metrics
-        debt_to_assets = (liabilities / assets * 100) if assets and liabilities and assets != 0 else None
-
-        prompt = f"""Assess risks for {data['company_info']['name']} ({data['company_info']['ticker']}):
-
-Company Context:
-- Sector: {data['company_info']['sector']}
-- Industry: {data['company_info']['industry']}
-- Market Cap: ${market_cap:,.2f}
-- Current Price: ${current_price:,.2f}
-- Employees: {data['company_info']['employees']}
-
-Financial Position (Latest Quarter {data['quarterly_data'][0]['date']}):
-- Revenue: ${revenue:,.2f}
-- Net Income: ${net_income:,.2f}
-- Profit Margin: {profit_margin:.2f}%
-- Total Assets: ${assets:,.2f}
-- Total Liabilities: ${liabilities:,.2f}
-- Debt to Assets Ratio: {f"{debt_to_assets:.2f}%" if debt_to_assets is not None else "N/A"}
-
-Provide a comprehensive risk assessment covering:
-1. Financial Risks
-   - Liquidity risk
-   - Credit risk
-   - Capital structure risk
-
-2. Market Risks
-   - Competition analysis
-   - Market share threats
-   - Industry disruption risks
-
-3. Operational Risks
-   - Supply chain
-   - Labor/workforce
-   - Technology dependencies
-
-4. Strategic Risks
-   - Business model sustainability
-   - Growth strategy risks
-   - Market positioning
-
-5. External Risks
-   - Regulatory environment
-   - Economic factors
-   - Geopolitical risks
-
-Include specific risk ratings (Low/Medium/High) for each category."""
-
-        response = requests.post(
-            LLMSTUDIO_URL,
-            json={
-                "messages": [
-                    {"role": "system", "content": "You are a risk analyst providing comprehensive risk assessments."},
-                    {"role": "user", "content": prompt}
-                ],
-                "temperature": 0.7,
-                "max_tokens": 300
-            }
-        )
-
-        if response.status_code == 200:
-            return jsonify({'risk_assessment': response.json()['choices'][0]['message']['content']})
-        else:
-            return jsonify({'error': "Error generating risk assessment"}), 500
+@app.route('/api/analyze', methods=['POST'])
+def analyze_financials():
+    return _llm_endpoint("You are a financial analyst. Give a concise analysis.", _analysis_prompt, 'analysis')
 
-    except Exception as e:
-        print(f"Error in assess_risk: {str(e)}")
-        return jsonify({'error': str(e)}), 500
+@app.route('/api/predict', methods=['POST'])
+def predict_financials():
+    return _llm_endpoint("You are a financial analyst making data-driven predictions.", _prediction_prompt, 'prediction')
 
+@app.route('/api/risk', methods=['POST'])
+def assess_risk():
+    return _llm_endpoint("You are a risk analyst. Be concise.", _risk_prompt, 'risk_assessment')
 
 if __name__ == '__main__':
-    app.run(debug=True)
+    # Local development only. In production serve with a threaded WSGI server,
+    # since requests spend their time waiting on Yahoo Finance and the LLM:
+    #   gunicorn -k gthread --workers 2 --threads 16 app:app
+    app.run()
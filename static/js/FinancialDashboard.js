@@ -69,7 +69,8 @@ const FinancialDashboard = () => {
     setAnalysisContent('');
     
     try {
-      const endpoint = `/api/${type}`;
+      // Stream the analysis as server-sent events so text shows up as it is generated
+      const endpoint = `/api/${type}?stream=1`;
       const response = await fetch(endpoint, {
         method: 'POST',
         headers: { 'Content-Type': 'application/json' },
@@ -81,12 +82,37 @@ const FinancialDashboard = () => {
         throw new Error(errorData.error || 'Failed to generate analysis');
       }
 
-      const result = await response.json();
-      setAnalysisContent(
-        result[type === 'analyze' ? 'analysis' :
-              type === 'predict' ? 'prediction' :
-              'risk_assessment']
-      );
+      const reader = response.body.getReader();
+      const decoder = new TextDecoder();
+      let buffer = '';
+      let content = '';
+
+      while (true) {
+        const { done, value } = await reader.read();
+        if (done) break;
+        buffer += decoder.decode(value, { stream: true });
+
+        // Events are separated by a blank line
+        const events = buffer.split('\n\n');
+        buffer = events.pop();
+
+        for (const event of events) {
+          let eventType = 'message';
+          let payload = '';
+          for (const line of event.split('\n')) {
+            if (line.startsWith('event:')) eventType = line.slice(6).trim();
+            else if (line.startsWith('data:')) payload += line.slice(5).trim();
+          }
+
+          if (eventType === 'error') {
+            throw new Error(JSON.parse(payload).error || 'Failed to generate analysis');
+          }
+          if (eventType === 'message' && payload) {
+            content += JSON.parse(payload).content;
+            setAnalysisContent(content);
+          }
+        }
+      }
     } catch (err) {
       setError(err.message);
     } finally {
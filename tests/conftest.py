@@ -0,0 +1,67 @@
+import os
+import sys
+
+import pandas as pd
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import app as app_module  # noqa: E402
+
+QUARTERS = pd.to_datetime(['2024-06-30', '2024-03-31', '2023-12-31', '2023-09-30', '2023-06-30', '2023-03-31'])
+
+class FakeTicker:
+    """Stand-in for yf.Ticker; symbols starting with BAD look like unknown tickers"""
+
+    calls = []
+
+    def __init__(self, symbol):
+        self.symbol = symbol
+        FakeTicker.calls.append(symbol)
+
+    @property
+    def info(self):
+        if self.symbol.startswith('BAD'):
+            return {'trailingPegRatio': None}
+        return {
+            'quoteType': 'EQUITY',
+            'longName': f'{self.symbol} Inc.',
+            'currentPrice': 100.0,
+            'previousClose': 95.0,
+            'sharesOutstanding': 1000.0,
+            'marketCap': 100000.0,
+        }
+
+    @property
+    def quarterly_income_stmt(self):
+        return pd.DataFrame(
+            [[400.0, 300.0, 200.0, 100.0], [40.0, 30.0, 20.0, 10.0]],
+            index=['Total Revenue', 'Net Income'],
+            columns=QUARTERS[:4],
+        )
+
+    @property
+    def quarterly_balance_sheet(self):
+        return pd.DataFrame(
+            [[5000.0] * 4, [2000.0] * 4],
+            index=['Total Assets', 'Total Liabilities'],
+            columns=QUARTERS[:4],
+        )
+
+@pytest.fixture
+def fake_ticker(monkeypatch):
+    FakeTicker.calls = []
+    monkeypatch.setattr(app_module.yf, 'Ticker', FakeTicker)
+    return FakeTicker
+
+@pytest.fixture(autouse=True)
+def fresh_caches(monkeypatch):
+    for name in ['_ticker_cache', '_info_cache', '_income_cache', '_balance_cache',
+                 '_llm_cache', '_response_cache', '_invalid_tickers']:
+        old = getattr(app_module, name)
+        monkeypatch.setattr(app_module, name, app_module.TTLCache(maxsize=old.maxsize, ttl=old.ttl))
+
+@pytest.fixture
+def client():
+    app_module.app.config['TESTING'] = True
+    return app_module.app.test_client()
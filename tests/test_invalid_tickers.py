@@ -0,0 +1,37 @@
+import app as app_module
+
+def test_unknown_ticker_fails_fast_and_is_remembered(client, fake_ticker, monkeypatch):
+    statements_fetched = []
+    monkeypatch.setattr(fake_ticker, 'quarterly_income_stmt',
+                        property(lambda self: statements_fetched.append(self.symbol)))
+
+    response = client.get('/api/stock/BADX')
+
+    assert response.status_code == 404
+    assert response.get_json() == {'error': 'Invalid ticker BADX'}
+    assert statements_fetched == []
+
+    # A second miss confirms the ticker; later lookups are answered without Yahoo
+    assert client.get('/api/stock/badx').status_code == 404
+    assert client.get('/api/stock/BADX').status_code == 404
+    assert fake_ticker.calls == ['BADX', 'BADX']
+
+def test_transient_empty_info_does_not_block_real_ticker(client, fake_ticker, monkeypatch):
+    real_info = fake_ticker.info
+    failures = ['AAPL']
+
+    def flaky_info(self):
+        # First lookup behaves like a swallowed Yahoo HTTP error
+        if self.symbol in failures:
+            failures.remove(self.symbol)
+            return {}
+        return real_info.fget(self)
+
+    monkeypatch.setattr(fake_ticker, 'info', property(flaky_info))
+
+    assert client.get('/api/stock/AAPL').status_code == 404
+
+    response = client.get('/api/stock/AAPL')
+    assert response.status_code == 200
+    assert response.get_json()['company_info']['ticker'] == 'AAPL'
+    assert app_module._invalid_tickers.get('AAPL') is None
@@ -0,0 +1,128 @@
+import json
+
+import pytest
+
+import app as app_module
+
+STOCK_DATA = {
+    'company_info': {
+        'name': 'Apple Inc.', 'ticker': 'AAPL', 'sector': 'Technology', 'industry': 'Hardware',
+        'marketCap': 3e12, 'currentPrice': 190.0, 'employees': 160000,
+        'lastUpdated': '2024-07-01 12:00:00',
+    },
+    'quarterly_data': [
+        {'date': '2024-06-30', 'metrics': {'Revenue': 85e9, 'NetIncome': 21e9, 'Assets': 3.3e11,
+                                           'Liabilities': 2.6e11, 'ProfitMargin': 24.7, 'EPS': 1.4}},
+        {'date': '2024-03-31', 'metrics': {'Revenue': 90e9, 'NetIncome': 23e9, 'ProfitMargin': 25.5}},
+    ],
+}
+
+class FakeLLMResponse:
+    def __init__(self, status_code=200, lines=(), content=None):
+        self.status_code = status_code
+        self._lines = lines
+        self._content = content
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def iter_lines(self):
+        for line in self._lines:
+            yield line.encode('utf-8')
+
+    def json(self):
+        return {'choices': [{'message': {'content': self._content}}]}
+
+def sse_lines(*deltas, done=True):
+    lines = [f"data: {json.dumps({'choices': [{'delta': {'content': d}}]})}" for d in deltas]
+    if done:
+        lines.append('data: [DONE]')
+    return lines
+
+@pytest.fixture
+def llm_post(monkeypatch):
+    """Replace LLM_SESSION.post; set .response before use, inspect .calls afterwards"""
+    class Recorder:
+        response = None
+        calls = []
+
+        def __call__(self, url, json=None, **kwargs):
+            self.calls.append({'json': json, **kwargs})
+            return self.response
+
+    recorder = Recorder()
+    recorder.calls = []
+    monkeypatch.setattr(app_module.LLM_SESSION, 'post', recorder)
+    return recorder
+
+def parse_events(body):
+    events = []
+    for block in body.strip().split('\n\n'):
+        event = {'event': 'message', 'data': ''}
+        for line in block.split('\n'):
+            key, _, value = line.partition(':')
+            event[key] = value.strip()
+        events.append((event['event'], json.loads(event['data'])))
+    return events
+
+def test_stream_relays_chunks_and_caches_completion(client, llm_post):
+    llm_post.response = FakeLLMResponse(lines=[': keep-alive', ''] + sse_lines('Solid ', 'quarter.'))
+
+    response = client.post('/api/analyze?stream=1', json=STOCK_DATA)
+
+    assert response.mimetype == 'text/event-stream'
+    assert parse_events(response.get_data(as_text=True)) == [
+        ('message', {'content': 'Solid '}),
+        ('message', {'content': 'quarter.'}),
+        ('done', {}),
+    ]
+    assert llm_post.calls[0]['stream'] is True
+
+    # A repeat view (lastUpdated refreshed) is served from the cache
+    repeat = dict(STOCK_DATA, company_info=dict(STOCK_DATA['company_info'], lastUpdated='later'))
+    cached = client.post('/api/analyze', json=repeat)
+    assert cached.get_json() == {'analysis': 'Solid quarter.'}
+    assert len(llm_post.calls) == 1
+
+def test_stream_without_done_is_not_cached(client, llm_post):
+    llm_post.response = FakeLLMResponse(lines=sse_lines('Cut off', done=False))
+    client.post('/api/risk?stream=1', json=STOCK_DATA).get_data()
+
+    llm_post.response = FakeLLMResponse(content='Full assessment')
+    response = client.post('/api/risk', json=STOCK_DATA)
+
+    assert response.get_json() == {'risk_assessment': 'Full assessment'}
+    assert len(llm_post.calls) == 2
+
+def test_stream_reports_llm_error_status(client, llm_post):
+    llm_post.response = FakeLLMResponse(status_code=503)
+
+    response = client.post('/api/predict?stream=1', json=STOCK_DATA)
+
+    events = parse_events(response.get_data(as_text=True))
+    assert events == [('error', {'error': 'LLM responded with status 503'})]
+
+def test_non_stream_error_status_returns_500(client, llm_post):
+    llm_post.response = FakeLLMResponse(status_code=500)
+
+    response = client.post('/api/predict', json=STOCK_DATA)
+
+    assert response.status_code == 500
+    assert response.get_json() == {'error': 'Error generating prediction'}
+
+@pytest.mark.parametrize('query, expected', [
+    ('', app_module.LLM_DEFAULT_MAX_TOKENS),
+    ('?max_tokens=400', 400),
+    ('?max_tokens=0', 1),
+    ('?max_tokens=99999', app_module.LLM_MAX_TOKENS_LIMIT),
+    ('?max_tokens=lots', app_module.LLM_DEFAULT_MAX_TOKENS),
+])
+def test_max_tokens_is_clamped(client, llm_post, query, expected):
+    llm_post.response = FakeLLMResponse(content='ok')
+
+    client.post(f'/api/analyze{query}', json=STOCK_DATA)
+
+    assert llm_post.calls[0]['json']['max_tokens'] == expected
@@ -0,0 +1,91 @@
+import warnings
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+
+import app as app_module
+from conftest import QUARTERS
+
+def test_batch_splits_results_and_errors(client, fake_ticker):
+    response = client.get('/api/stocks?symbols=aapl, MSFT,BADX')
+
+    assert response.status_code == 200
+    body = response.get_json()
+    assert set(body['results']) == {'AAPL', 'MSFT'}
+    assert set(body['errors']) == {'BADX'}
+    assert body['results']['AAPL']['company_info']['ticker'] == 'AAPL'
+    assert body['results']['AAPL']['quarterly_data'][0]['metrics']['Revenue'] == 400.0
+
+def test_batch_rejects_too_many_symbols(client, fake_ticker):
+    symbols = ','.join(f'T{i}' for i in range(21))
+
+    response = client.get(f'/api/stocks?symbols={symbols}')
+
+    assert response.status_code == 400
+    assert fake_ticker.calls == []
+
+def test_batch_requires_symbols(client, fake_ticker):
+    assert client.get('/api/stocks?symbols= ,').status_code == 400
+
+def test_single_ticker_is_normalised(client, fake_ticker):
+    response = client.get('/api/stock/aapl')
+
+    assert response.status_code == 200
+    assert response.get_json()['company_info']['ticker'] == 'AAPL'
+    client.get('/api/stock/AAPL')
+    assert fake_ticker.calls == ['AAPL']
+
+def test_statement_fallback_labels_and_misaligned_quarters(client, fake_ticker, monkeypatch):
+    income = pd.DataFrame(
+        [[np.nan, 300.0, 200.0, 100.0, 50.0], [410.0, 310.0, 210.0, 110.0, 60.0],
+         [np.nan, np.nan, 20.0, 10.0, 5.0], [41.0, 31.0, 21.0, 11.0, 6.0]],
+        index=['Total Revenue', 'Revenue', 'Net Income', 'Net Income Common Stockholders'],
+        columns=QUARTERS[:5],
+    )
+    # Balance sheet has an extra, older quarter and is missing the latest one
+    balance = pd.DataFrame(
+        [[5100.0, 5200.0, 5300.0, 5400.0, 5500.0], [2100.0, 2200.0, 2300.0, 2400.0, 2500.0]],
+        index=['Total Assets', 'Total Liabilities'],
+        columns=QUARTERS[1:6],
+    )
+    monkeypatch.setattr(fake_ticker, 'quarterly_income_stmt', property(lambda self: income))
+    monkeypatch.setattr(fake_ticker, 'quarterly_balance_sheet', property(lambda self: balance))
+
+    with warnings.catch_warnings():
+        warnings.simplefilter('error')
+        response = client.get('/api/stock/AAPL')
+
+    quarters = response.get_json()['quarterly_data']
+    assert [q['date'] for q in quarters] == ['2024-06-30', '2024-03-31', '2023-12-31', '2023-09-30']
+    assert [q['metrics']['Revenue'] for q in quarters] == [410.0, 300.0, 200.0, 100.0]
+    assert [q['metrics']['NetIncome'] for q in quarters] == [41.0, 31.0, 20.0, 10.0]
+    assert quarters[0]['metrics']['Assets'] is None
+    assert [q['metrics']['Liabilities'] for q in quarters[1:]] == [2100.0, 2200.0, 2300.0]
+
+def test_last_updated_reports_fetch_time_of_cached_data(client, fake_ticker, monkeypatch):
+    clock = [datetime(2024, 7, 1, 9, 30, 0)]
+
+    class FakeDatetime(datetime):
+        @classmethod
+        def now(cls, tz=None):
+            return clock[0]
+
+    monkeypatch.setattr(app_module, 'datetime', FakeDatetime)
+
+    first = client.get('/api/stock/AAPL').get_json()['company_info']['lastUpdated']
+    clock[0] = datetime(2024, 7, 1, 9, 33, 0)
+    second = client.get('/api/stock/AAPL').get_json()['company_info']['lastUpdated']
+
+    assert first == second == '2024-07-01 09:30:00'
+
+def test_cached_statements_skip_the_thread_pool(client, fake_ticker, monkeypatch):
+    assert client.get('/api/stock/AAPL').status_code == 200
+
+    class NoPool:
+        def submit(self, *args, **kwargs):
+            raise AssertionError('cached statements should not be fetched on the pool')
+
+    monkeypatch.setattr(app_module, '_statement_executor', NoPool())
+
+    assert client.get('/api/stock/AAPL').status_code == 200